@@ -1,3 +1,5 @@
+from string import Template
+
 html_head = r"""<?xml version="1.0" encoding="utf-8" ?>
 <!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
 <html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
@@ -190,6 +192,26 @@ nav= """<nav class="navbar fixed-top navbar-expand-lg navbar-light bg-light">
 </nav>"""
 
 
+report_snippet = Template("""
+    <div id="id-${idx}_filename-${filename_base}">
+      <script type="text/javascript">
+        var subj_qc = $subj_qc
+      </script>
+       <h2>idx-${idx}: $header</h2>
+      <div class="radio">
+        <label><input type="radio" name="inlineRadio$idx" id="inlineRating1" value="1" onclick="qc_update($idx, 'report', this.value)"> Good </label>
+        <label><input type="radio" name="inlineRadio$idx" id="inlineRating0" value="0" onclick="qc_update($idx, 'report', this.value)"> Bad</label>
+      </div>
+      <p> Notes: <input type="text" id="box$idx" oninput="qc_update($idx, 'note', this.value)"></p>
+      <object class="svg-reportlet" type="image/svg+xml" data="$path"> </object>
+    </div>
+    <script type="text/javascript">
+      subj_qc["report"] = -1
+      subjs.push(subj_qc)
+    </script>
+    """)
+
+
 def _generate_html_head(dl_file_name):
     """
     generate an html head block where the name of the downloaded file is set appropriately.
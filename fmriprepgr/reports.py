@@ -1,18 +1,65 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from shutil import copytree
 import re
 import json
+import warnings
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import Tag
+try:
+    from bs4 import XMLParsedAsHTMLWarning
+except ImportError:
+    # beautifulsoup4 < 4.11 doesn't warn about parsing xml as html
+    class XMLParsedAsHTMLWarning(UserWarning):
+        pass
 import click
-from bids import BIDSLayout
-from bids.tests import get_test_data_path
-from ._html_snippets import _generate_html_head, html_foot, reviewer_initials, nav
+from bids.layout.models import Config
+from ._html_snippets import _generate_html_head, html_foot, reviewer_initials, nav, report_snippet
 from ._svg_edit import _flip_images, _drop_image
-layout = BIDSLayout(Path(get_test_data_path()) / 'synthetic')
+# compile the bids and derivatives entity patterns once instead of on every parse
+_ENTITIES = [(ent.name, ent.regex, ent.dtype)
+             for config in ['bids', 'derivatives']
+             for ent in Config.load(config).entities.values()
+             if ent.regex is not None]
+# only build the parts of a report's tree we actually use, this flattens the document into a
+# list of run titles, captions, and reportlets in document order
+_REPORT_STRAINER = SoupStrainer(attrs={'class': ['svg-reportlet', 'run-title', 'elem-caption']})
+# row fields that aren't written into the subj_qc json or the header of a report snippet
+_ID_BLACKLIST = frozenset(['path', 'run_title', 'elem_caption', 'extension', 'filename'])
+_HEADER_BLACKLIST = _ID_BLACKLIST | frozenset(['desc', 'report_type', 'idx', 'chunk'])
+# fields added to the end of every subj_qc json, needed for scripting to update counts as you scroll around
+_SUBJ_QC_FIELDS = {'been_on_screen': False, 'rater': np.nan, 'report': np.nan, 'note': np.nan}
+# everything on a consolidated page between the html head and the first report snippet
+_PAGE_HEADER = '\n'.join(['', nav, reviewer_initials, ''])
+# subject level reports are named sub-{participant_ID}.html
+_SUBJ_RE = re.compile(r'^sub-([a-zA-Z0-9]+)\.html$')
+
+
+def _parse_entities(path, entities=_ENTITIES):
+    """
+    Parse the BIDS entities out of a path.
+    Parameters
+    ----------
+    path : str or Path
+        Path to parse, matched in the same way as `BIDSLayout.parse_file_entities`.
+    entities : list of tuple
+        (name, compiled regex, dtype) for each entity to look for.
+
+    Returns
+    -------
+    ents : dict
+        Dictionary of the entities found in the path and their values.
+    """
+    path = str(path)
+    ents = {}
+    for name, regex, dtype in entities:
+        match = regex.search(path)
+        if match is not None:
+            ents[name] = dtype(match.group(1))
+    return ents
 
 def parse_report(report_path):
     """
@@ -27,130 +74,114 @@ def parse_report(report_path):
     report_elements : Pandas.DataFrame
         DataFrame of the images in the report and parsable metadata about those.
     """
+    report_elements = pd.DataFrame(_parse_report_rows(report_path))
+    return _add_report_type(report_elements)
+
+
+def _parse_report_rows(report_path):
+    """
+    Parse an fmriprep report into one row dictionary per image.
+    Parameters
+    ----------
+    report_path : str
+        Path to an existing fmriprep report html
+
+    Returns
+    -------
+    report_elements : list of dict
+        The images in the report and parsable metadata about those.
+    """
     report_path = Path(report_path)
-    # create a nested data structure from an html report
-    soup = BeautifulSoup(report_path.read_text(), 'html.parser')
-    file_divs = soup.findAll(attrs={'class':'svg-reportlet'})
+    # fmriprep reports start with an xml declaration, but they're html and should be parsed that way
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', XMLParsedAsHTMLWarning)
+        soup = BeautifulSoup(report_path.read_bytes(), 'lxml', from_encoding='utf-8', parse_only=_REPORT_STRAINER)
     # we're going to build a dataframe called report elements by
     # appending row dictionaries to this list
     report_elements = []
-    # default the previous run title to Nan
-    prev_run_title = np.nan
-    for fd in file_divs:
-        fig_path = fd.get('src', fd.get('data'))
-        # initialize the
-        row = layout.parse_file_entities(fig_path, config=['bids', 'derivatives'])
-        row['path'] = fig_path
-        row['filename'] = Path(fig_path).parts[-1]
-        elem_identifier = f"Parent div of {fig_path}"
-
-        # Run titles should be hierarchical, if the current object doesn't have one
-        # then it should be ok to use the previous one
-        run_titles = fd.parent.findAll("h3", attrs={"class": "run-title"})
-        try:
-            # validation may be a better name than retrieval
-            row['run_title'] = _unique_retrieval(run_titles, elem_identifier, 'run-title')
-            prev_run_title = row['run_title']
-        except ValueError:
-            row['run_title'] = prev_run_title
-
-        # Some elements aren't in divs so the parent returns the whole document
-        # in this case, loop through previous elements till we find one with an elem-caption class
-        try:
-            elem_captions = fd.parent.findAll("p", attrs={"class": "elem-caption"})
-            row['elem_caption'] = _unique_retrieval(elem_captions, elem_identifier, 'elem-caption')
-        except ValueError:
-            for prev in fd.previous_siblings:
-                if isinstance(prev, Tag) and prev.has_attr('class') and prev.get('class', '') == 'elem-caption':
-                    row['elem_caption'] = prev.text
-
-        report_elements.append(row)
-    report_elements = pd.DataFrame(report_elements)
-    # make a report type column, in general, this will just be the desc field, but some images don't have that
-    report_elements['report_type'] = report_elements.desc
-    dseg_ind = report_elements.report_type.isnull() & (report_elements.suffix == 'dseg')
-    report_elements.loc[dseg_ind, 'report_type'] = report_elements.loc[dseg_ind, 'suffix']
-    if 'space' in report_elements.columns:
-        t1w_ind = report_elements.report_type.isnull() & report_elements.space.notnull()
-        report_elements.loc[t1w_ind, 'report_type'] = report_elements.loc[t1w_ind, 'space']
-
+    # Run titles should be hierarchical, if the current object doesn't have one
+    # then it should be ok to use the previous one. Captions belong to the next reportlet only.
+    run_title = np.nan
+    elem_caption = np.nan
+    for elem in soup.children:
+        if not isinstance(elem, Tag):
+            continue
+        elem_classes = elem.get('class', [])
+        if 'run-title' in elem_classes:
+            run_title = elem.text
+        elif 'elem-caption' in elem_classes:
+            elem_caption = elem.text
+        elif 'svg-reportlet' in elem_classes:
+            fig_path = elem.get('src', elem.get('data'))
+            # initialize the row with the entities in the figure name
+            row = _parse_entities(fig_path)
+            row['path'] = fig_path
+            row['filename'] = Path(fig_path).parts[-1]
+            row['run_title'] = run_title
+            row['elem_caption'] = elem_caption
+            elem_caption = np.nan
+            report_elements.append(row)
     return report_elements
 
 
-def _unique_retrieval(element_list, elem_identifier, search_identifier):
+def _add_report_type(report_elements):
     """
-    Get the text from a ResultSet that is expected to have a length of 1.
+    Add a report_type column to a dataframe of parsed report images.
     Parameters
     ----------
-    element_list :  bs4.element.ResultSet
-        Result of a `findAll`
-    elem_identifier : str
-        An identifier for the element being searched, used in error messages.
-    search_identifier : str
-        An identifier for the thing being searched for, used in error messages.
+    report_elements : Pandas.DataFrame
+        DataFrame of the images in one or more reports, as returned by parse_report.
+
     Returns
     -------
-    str
-        Text for the single matching element if one was found.
+    report_elements : Pandas.DataFrame
+        The same DataFrame with the report_type column added.
     """
-    if len(element_list) > 1:
-        raise ValueError(f"{elem_identifier} has more than one {search_identifier}.")
-    elif len(element_list) == 0:
-        raise ValueError(f"{elem_identifier} has no {search_identifier}.")
-    else:
-        return element_list[0].text
+    # make a report type column, in general, this will just be the desc field, but some images don't have that,
+    # so fall back to the suffix for dsegs and then to the space
+    report_type = report_elements.desc.combine_first(report_elements.suffix.where(report_elements.suffix == 'dseg'))
+    if 'space' in report_elements.columns:
+        report_type = report_type.combine_first(report_elements.space)
+    report_elements['report_type'] = report_type
+
+    return report_elements
 
 
-def _make_report_snippet(row):
+def _make_report_snippet(row, header_ents=None):
     """
     Make a report snippet from a row generated by parse report.
     Parameters
     ----------
     row : dict
         Dictionary of report metadata for an svg from an fmriprep report.
+    header_ents : dict, optional
+        The non-null entities from row to show in the snippet header. If None, they're picked out of row.
 
     Returns
     -------
     snippet : str
         HTML snippet for the report image.
     """
-    id_blacklist = ['path', 'run_title', 'elem_caption', 'extension', 'filename']
-    header_blacklist = id_blacklist + ['desc', 'report_type', 'idx', 'chunk']
-    id_ents = {k:v for k,v in row.items() if k not in id_blacklist}
-    # needed for scripting to update counts as you scroll around
-    id_ents['been_on_screen'] = False
-    id_ents['rater'] = np.NaN
-    id_ents['report'] = np.NaN
-    id_ents['note'] = np.NaN
-    header_ents = {k:v for k,v in row.items() if k not in header_blacklist}
+    id_ents = {k: v for k, v in row.items() if k not in _ID_BLACKLIST}
+    if header_ents is None:
+        header_ents = {k: v for k, v in id_ents.items() if k not in _HEADER_BLACKLIST and pd.notnull(v)}
 
     # TODO: make this header a path to the relevant image
-    header_vals = [f'{k} <span class="bids-entity">{v}</span>' for k,v in header_ents.items() if pd.notnull(v)]
-    header = f" <h2>idx-{row['idx']}: " + ', '.join(header_vals) + "</h2>"
-    snippet = f"""
-    <div id="id-{row['idx']}_filename-{row['filename'].split('.')[0]}">
-      <script type="text/javascript">
-        var subj_qc = {json.dumps(id_ents)}
-      </script>
-      {header}
-      <div class="radio">
-        <label><input type="radio" name="inlineRadio{row['idx']}" id="inlineRating1" value="1" onclick="qc_update({row['idx']}, 'report', this.value)"> Good </label>
-        <label><input type="radio" name="inlineRadio{row['idx']}" id="inlineRating0" value="0" onclick="qc_update({row['idx']}, 'report', this.value)"> Bad</label>
-      </div>
-      <p> Notes: <input type="text" id="box{row['idx']}" oninput="qc_update({row['idx']}, 'note', this.value)"></p>
-      <object class="svg-reportlet" type="image/svg+xml" data="{row['path']}"> </object>
-    </div>
-    <script type="text/javascript">
-      subj_qc["report"] = -1
-      subjs.push(subj_qc)
-    </script>
-    """
+    header = ', '.join([f'{k} <span class="bids-entity">{v}</span>' for k,v in header_ents.items()])
+    snippet = report_snippet.substitute(idx=row['idx'],
+                                        filename_base=row['filename'].split('.')[0],
+                                        subj_qc=json.dumps({**id_ents, **_SUBJ_QC_FIELDS}),
+                                        header=header,
+                                        path=row['path'])
     return snippet
 
 
 @click.command()
 @click.option('--reports_per_page', default=50,
               help='How many figures per page. If None, then put them all on a single page.')
+@click.option('--n_procs', default=None, type=click.IntRange(min=1),
+              help='How many processes to use when parsing the subject reports. Defaults to the number of CPUs '
+                   'available to this process.')
 @click.option('--flip_images', '-f', default=(), multiple=True,
               help="The names of any report subsections where you want to flip which image is shown when mousing over."
                    " Can be passed multiple times to specify multiple subsections.")
@@ -163,7 +194,7 @@ def _make_report_snippet(row):
                    " and just see the image that's shown before mousing over. Can be passed multiple times to specify"
                    " multiple subsections.")
 @click.argument('fmriprep_output_path')
-def make_report(fmriprep_output_path, reports_per_page=50,
+def make_report(fmriprep_output_path, reports_per_page=50, n_procs=None,
                 flip_images=(), drop_background=(), drop_foreground=()):
     """
     Make a consolidated report from an fMRIPrep output directory. Optionally, you can also tweak the images in the
@@ -359,98 +390,107 @@ def make_report(fmriprep_output_path, reports_per_page=50,
         ]
     }
     (group_dir / 'dataset_description.json').write_text(json.dumps(dataset_description, indent=2))
-    # parse all the subject reports
-    all_htmls_paths = sorted(fmriprep_output_path.glob('**/sub-*.html'))
-    # If there are multiple sub-*.html inside the figures subfolder. So, we want to the select only the sub-xx.html
-    # file without having to hardcode the fmriprep directory structure and subject ID.
-    report_paths = []
-    for html in all_htmls_paths:
-        if layout.parse_file_entities(html)['suffix'] == layout.parse_file_entities(html)['subject']:
-            report_paths.append(html)
+    # parse all the subject reports, fmriprep puts these at the top level of the output directory, so list that
+    # instead of walking every subject's directory tree looking for them
+    report_paths = sorted(fmriprep_output_path / entry.name for entry in os.scandir(fmriprep_output_path)
+                          if _SUBJ_RE.match(entry.name) and entry.is_file())
     if not report_paths:
-        FileNotFoundError("No sub-{participant_ID}.html file was found. Please check if there are any sub-{participant_ID}.html"
-                          "on the provided fmriprep output directory.")
-    reports = []
-    for report_idx, report_path in enumerate(report_paths):
-        if not 'figures' in report_path.parts:
-            report = parse_report(report_path)
-            reports.append(report)
-
-            # symlink figures directory into place
-            subject = layout.parse_file_entities(report_path)['subject']
-            subj_group_dir = group_dir / f'sub-{subject}'
-            subj_group_dir.mkdir(exist_ok=True)
-
-            paths = []
-            # Depending which fmriprep version was used to preprocess the outputs might look different. Older versions of
-            # fmriprep had figure folder at the subject level and a figure folder inside the different sessions. The code
-            # below makes sure that only existing folders get copied, independent of the version used.
-            if 'session' in reports[report_idx]:
-                sessions = reports[report_idx]['session'].unique()
-                # drop the nan session
-                sessions = [session for session in sessions if str(session) != 'nan']
-                expected_subj_fig_dirs = [report_path.parent / f'sub-{subject}' / f'ses-{session}' / 'figures'
-                                          for session in sessions]
-                # Create session folders, if they exist on the original fmriprep output directory
-                group_session_dirs = [subj_group_dir / f'ses-{session}' for session in sessions]
-                # append 'figures' folders as the consolidated report expect all figures to be inside a figures folder
-                subj_group_fig_dirs = [group_session_dir / 'figures' for group_session_dir in group_session_dirs]
-
-                # append the top level figures folder
-                expected_subj_fig_dirs.append(report_path.parent / f'sub-{subject}' / 'figures')
-                subj_group_fig_dirs.append(subj_group_dir / 'figures')
+        raise FileNotFoundError("No sub-{participant_ID}.html file was found. Please check if there are any "
+                                "sub-{participant_ID}.html on the provided fmriprep output directory.")
+    # parsing is cpu bound and independent for each subject, so spread it across processes, but don't start more
+    # workers than there are reports or than the CPUs we're allowed to use (e.g., under a SLURM allocation)
+    if n_procs is None:
+        n_procs = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    n_procs = min(n_procs, len(report_paths))
+    if n_procs == 1:
+        reports = [_parse_report_rows(report_path) for report_path in report_paths]
+    else:
+        # hand each worker a few chunks so the load stays balanced if some reports are slower to parse
+        chunksize = max(1, len(report_paths) // (n_procs * 4))
+        with ProcessPoolExecutor(max_workers=n_procs) as executor:
+            reports = list(executor.map(_parse_report_rows, report_paths, chunksize=chunksize))
+
+    # list the group directory once up front, if a subject doesn't have a directory in there yet, then nothing
+    # below it can exist and we don't need to check each of its figures directories
+    group_dir_entries = {entry.name for entry in os.scandir(group_dir)}
+    for report_path, report in zip(report_paths, reports):
+        # symlink figures directory into place
+        subject = _SUBJ_RE.match(report_path.name).group(1)
+        subj_group_dir = group_dir / f'sub-{subject}'
+        subj_group_dir_existed = subj_group_dir.name in group_dir_entries
+        if not subj_group_dir_existed:
+            subj_group_dir.mkdir()
+
+        paths = []
+        # Depending which fmriprep version was used to preprocess the outputs might look different. Older versions of
+        # fmriprep had figure folder at the subject level and a figure folder inside the different sessions. The code
+        # below makes sure that only existing folders get copied, independent of the version used.
+        # unique sessions in the order they're found, images without a session don't have the key at all
+        sessions = list(dict.fromkeys(row['session'] for row in report if 'session' in row))
+        if sessions:
+            expected_subj_fig_dirs = [report_path.parent / f'sub-{subject}' / f'ses-{session}' / 'figures'
+                                      for session in sessions]
+            # Create session folders, if they exist on the original fmriprep output directory
+            group_session_dirs = [subj_group_dir / f'ses-{session}' for session in sessions]
+            # append 'figures' folders as the consolidated report expect all figures to be inside a figures folder
+            subj_group_fig_dirs = [group_session_dir / 'figures' for group_session_dir in group_session_dirs]
+
+            # append the top level figures folder
+            expected_subj_fig_dirs.append(report_path.parent / f'sub-{subject}' / 'figures')
+            subj_group_fig_dirs.append(subj_group_dir / 'figures')
 
+        else:
+            expected_subj_fig_dirs = [report_path.parent / f'sub-{subject}' / 'figures']
+            subj_group_fig_dirs = [subj_group_dir / 'figures']
+        for expected_subj_idx, expected_subj_fig_dir in enumerate(expected_subj_fig_dirs):
+            # Only find the relative path for figure folders that exist
+            if expected_subj_fig_dir.exists():
+                # Check if fmriprep-group-report figure directory already exists or is symlink
+                if subj_group_dir_existed and (subj_group_fig_dirs[expected_subj_idx].is_symlink() or
+                                               subj_group_fig_dirs[expected_subj_idx].exists()):
+                    raise ValueError(
+                        f"{subj_group_fig_dirs[expected_subj_idx]} exists and would be overwritten. "
+                        f"Rename or delete the existing group directory before running fmriprepgr.")
+
+                # only create session folders
+                if sessions and expected_subj_fig_dir.parents[0].name.startswith('ses-'):
+                    group_session_dirs[expected_subj_idx].mkdir(exist_ok=True)
+                # I don't like any of the relative path tools in python
+                # To get the relative path I want I've got to start from a place on the common path of
+                # expected_subj_fig_dir, which should be the fmriprep_output_path
+                good_parts = list(expected_subj_fig_dir.relative_to(fmriprep_output_path).parts)
+                # figure out how many levels down the subj_group_fig_dir is (should be 2, for fmriprep >= 21.0.0
+                # and 3 otherwise).
+                lvls_down = len(subj_group_fig_dirs[expected_subj_idx].relative_to(fmriprep_output_path).parts) - 1
+                # assemble the path parts into a list
+                path_parts = (['..'] * lvls_down + good_parts)
+
+                # Save the relative and subject group path
+                path = {}
+                # join them with os.path.join
+                path['orig_fig_dir'] = Path(os.path.join(*path_parts))
+                path['subj_fmriprep_fig_dir'] = expected_subj_fig_dir
+                path['subj_group_fig_dir'] = subj_group_fig_dirs[expected_subj_idx]
+                paths.append(path)
+
+
+        # if paths is empty, if it is empty no figures folder was found. Return an error and ask user to
+        # check the specified path
+        if not paths:
+            raise FileNotFoundError(f"The subject figures dir for sub-{subject}"
+                              f" was not at the expected location. Please use "
+                              " make sure that the passed fmriprep output directory looks like the one "
+                              " described layouts in the README and the documentation of this function. "
+                              " A default fmriprep is expected by this script.")
+
+        for path in paths:
+            if image_changes:
+                copytree(path['subj_group_fig_dir'].parent / path['orig_fig_dir'], path['subj_group_fig_dir'])
             else:
-                expected_subj_fig_dirs = [report_path.parent / f'sub-{subject}' / 'figures']
-                subj_group_fig_dirs = [subj_group_dir / 'figures']
-            for expected_subj_idx, expected_subj_fig_dir in enumerate(expected_subj_fig_dirs):
-                # Only find the relative path for figure folders that exist
-                if expected_subj_fig_dir.exists():
-                    # Check if fmriprep-group-report figure directory already exists or is symlink
-                    if subj_group_fig_dirs[expected_subj_idx].is_symlink() or \
-                       subj_group_fig_dirs[expected_subj_idx].exists():
-                        raise ValueError(
-                            f"{subj_group_fig_dirs[expected_subj_idx]} exists and would be overwritten. "
-                            f"Rename or delete the existing group directory before running fmriprepgr.")
-
-                    # only create session folders
-                    if ('session' in reports[report_idx]) and expected_subj_fig_dir.parents[0].name.startswith('ses-'):
-                        group_session_dirs[expected_subj_idx].mkdir(exist_ok=True)
-                    # I don't like any of the relative path tools in python
-                    # To get the relative path I want I've got to start from a place on the common path of
-                    # expected_subj_fig_dir, which should be the fmriprep_output_path
-                    good_parts = list(expected_subj_fig_dir.relative_to(fmriprep_output_path).parts)
-                    # figure out how many levels down the subj_group_fig_dir is (should be 2, for fmriprep >= 21.0.0
-                    # and 3 otherwise).
-                    lvls_down = len(subj_group_fig_dirs[expected_subj_idx].relative_to(fmriprep_output_path).parts) - 1
-                    # assemble the path parts into a list
-                    path_parts = (['..'] * lvls_down + good_parts)
-
-                    # Save the relative and subject group path
-                    path = {}
-                    # join them with os.path.join
-                    path['orig_fig_dir'] = Path(os.path.join(*path_parts))
-                    path['subj_fmriprep_fig_dir'] = expected_subj_fig_dir
-                    path['subj_group_fig_dir'] = subj_group_fig_dirs[expected_subj_idx]
-                    paths.append(path)
-
-
-            # if paths is empty, if it is empty no figures folder was found. Return an error and ask user to
-            # check the specified path
-            if not paths:
-                raise FileNotFoundError(f"The subject figures dir for sub-{subject}"
-                                  f" was not at the expected location. Please use "
-                                  " make sure that the passed fmriprep output directory looks like the one "
-                                  " described layouts in the README and the documentation of this function. "
-                                  " A default fmriprep is expected by this script.")
-
-            for path in paths:
-                if image_changes:
-                    copytree(path['subj_group_fig_dir'].parent / path['orig_fig_dir'], path['subj_group_fig_dir'])
-                else:
-                    path['subj_group_fig_dir'].symlink_to(path['orig_fig_dir'], target_is_directory=True)
-
-    reports = pd.concat(reports).reset_index(drop=True)
+                path['subj_group_fig_dir'].symlink_to(path['orig_fig_dir'], target_is_directory=True)
+
+    # build a single dataframe out of every subject's rows
+    reports = _add_report_type(pd.DataFrame.from_records([row for report in reports for row in report]))
 
     # make a consolidated report for each report type
     for report_type, rtdf in reports.groupby('report_type'):
@@ -487,12 +527,18 @@ def make_report(fmriprep_output_path, reports_per_page=50,
             consolidated_path = group_dir / f'consolidated_{report_type}_{chunk:03d}.html'
             dl_file_name =  f'consolidated_{report_type}_{chunk:03d}.tsv'
             cdf = cdf.reset_index(drop=True).reset_index().drop('idx', axis=1).rename(columns={'index': 'idx'})
-            lines = '\n'.join([_make_report_snippet(row) for row in cdf.to_dict('records')])
-
-            rpt_text = '\n'.join([_generate_html_head(dl_file_name),
-                                  nav,
-                                  reviewer_initials,
-                                  lines,
-                                  html_foot])
-            consolidated_path.write_text(rpt_text)
+            columns = list(cdf.columns)
+            # find the missing header values for the whole page at once instead of checking them one at a time
+            header_cols = [col for col in columns if col not in _HEADER_BLACKLIST]
+            header_notnull = cdf[header_cols].notna().to_numpy()
+            # write the snippets out as they're made instead of building the whole page in memory
+            with consolidated_path.open('w', buffering=1 << 20) as rpt_file:
+                rpt_file.write(_generate_html_head(dl_file_name))
+                rpt_file.write(_PAGE_HEADER)
+                for values, notnull in zip(cdf.itertuples(index=False, name=None), header_notnull):
+                    row = dict(zip(columns, values))
+                    header_ents = {col: row[col] for col, keep in zip(header_cols, notnull) if keep}
+                    rpt_file.write(_make_report_snippet(row, header_ents))
+                    rpt_file.write('\n')
+                rpt_file.write(html_foot)
 
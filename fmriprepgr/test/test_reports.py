@@ -1,4 +1,5 @@
 from pathlib import Path
+import warnings
 from shutil import copytree, rmtree
 import numpy as np
 import pandas as pd
@@ -66,6 +67,48 @@ def test_parse_report():
     expected_output['subject'] = expected_output.subject.astype(str)
     assert expected_output.equals(output)
 
+def test_parse_report_no_warnings():
+    """
+    Run `reports.parse_report` on sub-20900.html, which starts with an xml declaration, and confirm that it doesn't
+    emit any warnings.
+    Returns
+    -------
+    None
+    """
+    test_data_dir = Path(__file__).parent.resolve() / 'data'
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        parse_report(test_data_dir / 'fmriprep/sub-20900.html')
+
+def test_parse_report_shared_parent(tmp_path):
+    """
+    Run `reports.parse_report` on a report where several reportlets share a parent and confirm that each reportlet
+    gets its own caption and that run titles carry forward to reportlets that don't have one.
+    Returns
+    -------
+    None
+    """
+    report_path = tmp_path / 'sub-01.html'
+    report_path.write_text("""<html><body>
+    <div id="Anatomical">
+      <div>
+        <h3 class="run-title">Spatial normalization</h3>
+        <p class="elem-caption">Caption for <code>MNI152NLin6Asym</code>.</p>
+        <object class="svg-reportlet" type="image/svg+xml" data="./sub-01/figures/sub-01_space-MNI152NLin6Asym_T1w.svg"></object>
+        <p class="elem-caption">Caption for <code>MNI152NLin2009cAsym</code>.</p>
+        <object class="svg-reportlet" type="image/svg+xml" data="./sub-01/figures/sub-01_space-MNI152NLin2009cAsym_T1w.svg"></object>
+      </div>
+      <div>
+        <img class="svg-reportlet" src="./sub-01/figures/sub-01_desc-reconall_T1w.svg" />
+      </div>
+    </div>
+    </body></html>""")
+    output = parse_report(report_path)
+    assert output.report_type.tolist() == ['MNI152NLin6Asym', 'MNI152NLin2009cAsym', 'reconall']
+    assert output.run_title.tolist() == ['Spatial normalization'] * 3
+    assert output.elem_caption.tolist()[:2] == ['Caption for MNI152NLin6Asym.', 'Caption for MNI152NLin2009cAsym.']
+    assert pd.isnull(output.elem_caption[2])
+
 def test_make_report(tmp_path):
     test_out_dir = tmp_path
     test_data_dir = Path(__file__).parent.resolve() / 'data/fmriprep'
@@ -74,7 +117,15 @@ def test_make_report(tmp_path):
     with pytest.raises(ValueError):
         ret = make_report([test_fmriprep_dir.as_posix()])
 
-def test_fmriprepgr(tmp_path, script_runner):
+def test_make_report_no_reports(tmp_path):
+    test_fmriprep_dir = tmp_path / 'fmriprep'
+    (test_fmriprep_dir / 'sub-01' / 'figures').mkdir(parents=True)
+    (test_fmriprep_dir / 'sub-01' / 'figures' / 'sub-01.html').write_text('')
+    with pytest.raises(FileNotFoundError):
+        ret = make_report([test_fmriprep_dir.as_posix()])
+
+@pytest.mark.parametrize('n_procs', [1, 2])
+def test_fmriprepgr(tmp_path, script_runner, n_procs):
     test_out_dir = tmp_path
     test_data_dir = Path(__file__).parent.resolve() / 'data/fmriprep'
     test_fmriprep_dir = test_out_dir / 'fmriprep'
@@ -82,7 +133,7 @@ def test_fmriprepgr(tmp_path, script_runner):
     # get rid of the expected outputs
     rmtree(test_fmriprep_dir / 'group')
 
-    ret = script_runner.run('fmriprepgr', test_fmriprep_dir.as_posix())
+    ret = script_runner.run('fmriprepgr', f'--n_procs={n_procs}', test_fmriprep_dir.as_posix())
     assert ret.success
     expected_out_dir = test_data_dir / 'group'
     out_dir = test_fmriprep_dir / 'group'
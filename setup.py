@@ -13,7 +13,8 @@ setup(
         'pybids>=0.14',
         'pandas',
         'numpy',
-        'beautifulsoup4'
+        'beautifulsoup4',
+        'lxml'
     ],
     entry_points={
         'console_scripts':[